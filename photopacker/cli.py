@@ -4,11 +4,14 @@ Command-line interface for PhotoPacker.
 
 import argparse
 import logging
+import os
 import sys
 from typing import List, Optional
 
-from .constants import DEFAULT_DPI, DEFAULT_MARGIN_MM, DEFAULT_PAGE_SIZE, PAGE_SIZES
-from .core import PhotoPacker
+from .constants import (
+    DEFAULT_DPI, DEFAULT_MARGIN_MM, DEFAULT_OUTPUT_FORMAT, DEFAULT_PAGE_SIZE,
+    DEFAULT_QUALITY, OUTPUT_FORMATS, PAGE_SIZES, QUALITY_RANGE
+)
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -51,6 +54,7 @@ Examples:
   %(prog)s -i input -o output --page-size a3
   %(prog)s -i input -o output --page-size a4 --margin 5
   %(prog)s -i input -o output --dpi 150
+  %(prog)s -i input -o output --format png
 
 Input directory structure should contain size-named folders:
   input/
@@ -92,6 +96,25 @@ Supported page sizes: a4, a3, letter, legal
         default=DEFAULT_MARGIN_MM,
         help=f'Margin between images in millimeters (default: {DEFAULT_MARGIN_MM}mm)'
     )
+    parser.add_argument(
+        '--format', 
+        choices=list(OUTPUT_FORMATS.keys()),
+        default=DEFAULT_OUTPUT_FORMAT,
+        help=f'Collage file format (default: {DEFAULT_OUTPUT_FORMAT})'
+    )
+    parser.add_argument(
+        '--quality', 
+        type=int, 
+        default=DEFAULT_QUALITY,
+        help=f'JPEG quality from {QUALITY_RANGE[0]} to {QUALITY_RANGE[1]} '
+             f'(default: {DEFAULT_QUALITY})'
+    )
+    parser.add_argument(
+        '-j', '--workers', 
+        type=int, 
+        default=None,
+        help='Number of collages rendered in parallel (default: number of CPUs)'
+    )
     parser.add_argument(
         '-v', '--verbose', 
         action='store_true',
@@ -115,14 +138,25 @@ def main(args: Optional[List[str]] = None) -> int:
     # Set up logging
     setup_logging(parsed_args.verbose)
     
+    # Imported here so --help and usage errors don't pay for loading Pillow
+    from .core import PhotoPacker
+    
     # Create PhotoPacker instance
-    packer = PhotoPacker(
-        input_dir=parsed_args.input,
-        output_dir=parsed_args.output,
-        page_size=parsed_args.page_size,
-        dpi=parsed_args.dpi,
-        margin_mm=parsed_args.margin
-    )
+    try:
+        packer = PhotoPacker(
+            input_dir=parsed_args.input,
+            output_dir=parsed_args.output,
+            page_size=parsed_args.page_size,
+            dpi=parsed_args.dpi,
+            margin_mm=parsed_args.margin,
+            output_format=parsed_args.format,
+            quality=parsed_args.quality,
+            workers=parsed_args.workers or os.cpu_count() or 1
+        )
+    except ValueError as e:
+        # Invalid settings, reported like an argparse usage error
+        logger.error("%s", e)
+        return 2
     
     # Process images
     return packer.process()
\ No newline at end of file
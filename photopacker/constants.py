@@ -14,6 +14,15 @@ PAGE_SIZES = {
 DEFAULT_DPI = 300  # Standard print quality
 DEFAULT_MARGIN_MM = 2  # Default margin in millimeters
 DEFAULT_PAGE_SIZE = 'a4'  # Default page size
+DEFAULT_OUTPUT_FORMAT = 'jpg'  # Much faster to encode than PNG
+DEFAULT_QUALITY = 92  # JPEG quality, visually lossless for photos
+QUALITY_RANGE = (1, 95)  # Pillow's useful JPEG quality range
+
+# Output formats (file extension -> Pillow format name)
+OUTPUT_FORMATS = {
+    'jpg': 'JPEG',
+    'png': 'PNG'
+}
 
 # Image file extensions
 IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp'}
\ No newline at end of file
@@ -3,17 +3,41 @@ Core functionality for the PhotoPacker package.
 """
 
 import os
+import functools
 import logging
-from typing import Dict, List, Tuple
+import logging.handlers
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import repeat
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 from PIL import Image
+# Register only the formats in IMAGE_EXTENSIONS instead of every Pillow plugin
+from PIL import BmpImagePlugin, JpegImagePlugin, PngImagePlugin, TiffImagePlugin  # noqa: F401
 
-from .constants import PAGE_SIZES, IMAGE_EXTENSIONS
-from .image_utils import cm_to_pixels, resize_image_to_fit, center_on_background
+from .constants import PAGE_SIZES, IMAGE_EXTENSIONS, OUTPUT_FORMATS, QUALITY_RANGE
+from .image_utils import (
+    VipsLoadError, can_load_with_vips, cm_to_pixels, fit_size, load_with_vips,
+    resize_image_to_fit
+)
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
+# Load the common plugins; with the imports above, Image.open never needs
+# the full Image.init() for supported files
+Image.preinit()
+
+# Large scans and panoramas are expected input, not decompression bombs
+Image.MAX_IMAGE_PIXELS = None
+
+# Upper bound on threads loading images for a single collage
+MAX_SLOT_THREADS = 4
+
+# Modes pasted onto the collage using their own alpha band as the mask
+ALPHA_MODES = {'RGBA', 'LA'}
+
 class PhotoPacker:
     """Handles photo processing and collage creation with exact physical dimensions."""
     
@@ -23,7 +47,10 @@ class PhotoPacker:
         output_dir: str, 
         page_size: str = 'a4', 
         dpi: int = 300, 
-        margin_mm: int = 2
+        margin_mm: int = 2,
+        output_format: str = 'jpg',
+        quality: int = 92,
+        workers: int = 1
     ):
         """
         Initialize PhotoPacker.
@@ -34,24 +61,49 @@ class PhotoPacker:
             page_size: Page size ('a4', 'a3', 'letter', 'legal')
             dpi: Resolution for output images (default: 300 for photo printing)
             margin_mm: Margin between images in millimeters (default: 2mm)
+            output_format: Collage file format ('jpg', 'png')
+            quality: JPEG quality, 1-95 (default: 92; ignored for PNG)
+            workers: Number of processes rendering collages (default: 1, in
+                this process). More than 1 spawns worker processes, so scripts
+                must guard their entry point with if __name__ == "__main__".
         """
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
+        self._collages_dir = self.output_dir / "collages"
         self.page_size = page_size.lower()
         self.dpi = dpi
         self.margin_mm = margin_mm
+        self.output_format = output_format.lower()
+        self.quality = quality
+        self.workers = workers
         
         # Validate page size
         if self.page_size not in PAGE_SIZES:
             raise ValueError(f"Unsupported page size: {page_size}")
         
+        # Validate output format
+        if self.output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        
+        # Validate JPEG quality (PNG output doesn't use it)
+        min_quality, max_quality = QUALITY_RANGE
+        if (OUTPUT_FORMATS[self.output_format] == 'JPEG'
+                and not min_quality <= self.quality <= max_quality):
+            raise ValueError(f"Quality must be between {min_quality} and "
+                             f"{max_quality}: {quality}")
+        
+        # Validate worker count
+        if self.workers < 1:
+            raise ValueError(f"Workers must be at least 1: {workers}")
+        
         # Ensure output directory exists
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        (self.output_dir / "collages").mkdir(exist_ok=True)
+        self._collages_dir.mkdir(exist_ok=True)
         
-        logger.info(f"Initialized PhotoPacker with: input={self.input_dir}, "
-                  f"output={self.output_dir}, page_size={self.page_size}, "
-                  f"dpi={self.dpi}, margin={self.margin_mm}mm")
+        logger.info("Initialized PhotoPacker with: input=%s, "
+                  "output=%s, page_size=%s, dpi=%s, margin=%smm, format=%s",
+                  self.input_dir, self.output_dir, self.page_size,
+                  self.dpi, self.margin_mm, self.output_format)
 
     def process(self) -> int:
         """
@@ -67,19 +119,14 @@ class PhotoPacker:
             logger.info("Processing completed successfully!")
             return 0
         except Exception as e:
-            logger.error(f"Error during processing: {e}")
-            import traceback
-            logger.debug(traceback.format_exc())
+            logger.error("Error during processing: %s", e)
+            logger.debug("Traceback:", exc_info=True)
             return 1
 
     def _create_direct_collages(self) -> None:
         """Create collages by placing images directly without individual processing."""
         logger.info("Creating direct collages...")
         
-        # Get page dimensions
-        page_width_cm, page_height_cm = PAGE_SIZES[self.page_size]
-        margin_cm = self.margin_mm / 10.0  # Convert mm to cm
-        
         # Group images by size
         size_groups = self._group_images_by_size()
         
@@ -89,38 +136,82 @@ class PhotoPacker:
         
         # Count for naming collages
         collage_count = 0
+        jobs = []
         
         # Process each size group
         for (image_width_cm, image_height_cm), image_paths in size_groups.items():
-            # Calculate how many images can fit per page
-            available_width = page_width_cm - 2 * margin_cm
-            available_height = page_height_cm - 2 * margin_cm
-            
-            # Calculate grid dimensions
-            cols = int((available_width + margin_cm) / (image_width_cm + margin_cm))
-            rows = int((available_height + margin_cm) / (image_height_cm + margin_cm))
-            
+            (page_width_px, page_height_px, image_width_px, image_height_px,
+             margin_px, cols, rows) = _layout(
+                self.page_size, self.dpi, self.margin_mm,
+                image_width_cm, image_height_cm
+            )
             images_per_page = cols * rows
             
-            logger.info(f"Size {image_width_cm}×{image_height_cm}cm: "
-                      f"{len(image_paths)} images, "
-                      f"{cols}×{rows} grid ({images_per_page} per page)")
+            logger.info("Size %s×%scm: %d images, %d×%d grid (%d per page)",
+                      image_width_cm, image_height_cm, len(image_paths),
+                      cols, rows, images_per_page)
             
             if images_per_page == 0:
-                logger.warning(f"Images {image_width_cm}×{image_height_cm}cm are too large "
-                             f"for {self.page_size} pages")
+                logger.warning("Images %s×%scm are too large for %s pages",
+                             image_width_cm, image_height_cm, self.page_size)
                 continue
             
-            # Create collages for this size group
+            # Queue collages for this size group
             for i in range(0, len(image_paths), images_per_page):
                 batch_images = image_paths[i:i + images_per_page]
                 collage_count += 1
+                collage_path = (self._collages_dir /
+                                f"collage_{collage_count:03d}.{self.output_format}")
                 
-                self._create_single_collage(
-                    batch_images, collage_count, 
-                    image_width_cm, image_height_cm,
-                    cols, rows, margin_cm
-                )
+                jobs.append((
+                    batch_images, collage_path, self.dpi,
+                    page_width_px, page_height_px,
+                    image_width_px, image_height_px,
+                    cols, rows, margin_px,
+                    OUTPUT_FORMATS[self.output_format], self.quality
+                ))
+        
+        if not jobs:
+            return
+        
+        # Render in this process unless there is more than one worker and
+        # more than one collage to give them
+        max_workers = min(self.workers, len(jobs))
+        if max_workers == 1:
+            for job in jobs:
+                _render_collage(job, slot_threads=MAX_SLOT_THREADS)
+            return
+        
+        # Each collage is independent, so render them in parallel.
+        # chunksize=1 because every job is heavy (decode, resize, encode).
+        # Workers are spawned rather than forked: forking after libvips has
+        # started its thread pool deadlocks the children.
+        # Cores not taken by a process go to per-collage image loading.
+        cpu_count = os.cpu_count() or 1
+        slot_threads = min(MAX_SLOT_THREADS, max(1, cpu_count // max_workers))
+        render = partial(_render_collage, slot_threads=slot_threads)
+        mp_context = multiprocessing.get_context("spawn")
+        
+        # Spawned workers don't inherit logging setup, so forward their
+        # records to this process' handlers (or to stderr for warnings and
+        # errors, as logging does in-process when nothing is configured)
+        root_logger = logging.getLogger()
+        handlers = root_logger.handlers or [logging.lastResort]
+        log_queue = mp_context.Queue()
+        listener = logging.handlers.QueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        listener.start()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=mp_context,
+                initializer=_init_worker,
+                initargs=(log_queue, root_logger.getEffectiveLevel())
+            ) as executor:
+                list(executor.map(render, jobs, chunksize=1))
+        finally:
+            listener.stop()
 
     def _group_images_by_size(self) -> Dict[Tuple[float, float], List[Path]]:
         """
@@ -131,80 +222,161 @@ class PhotoPacker:
         """
         size_groups = {}
         
-        for folder in self.input_dir.iterdir():
-            if not folder.is_dir():
-                continue
-            
-            # Parse folder name (e.g., "10_15" for 10×15cm)
-            try:
-                parts = folder.name.split('_')
-                if len(parts) == 2:
-                    width_cm = float(parts[0])
-                    height_cm = float(parts[1])
-                    
-                    # Get all images in this folder
-                    images = [
-                        f for f in folder.iterdir() 
-                        if f.is_file() and f.suffix.lower() in IMAGE_EXTENSIONS
-                    ]
-                    
-                    if images:
-                        size_groups[(width_cm, height_cm)] = images
-                        logger.info(f"Found {len(images)} images for size {width_cm}×{height_cm}cm")
+        # os.scandir gets file types from the directory listing itself,
+        # avoiding a stat() call per entry
+        with os.scandir(self.input_dir) as folders:
+            for folder in folders:
+                if not folder.is_dir():
+                    continue
+                
+                # Parse folder name (e.g., "10_15" for 10×15cm)
+                try:
+                    parts = folder.name.split('_')
+                    if len(parts) == 2:
+                        width_cm = float(parts[0])
+                        height_cm = float(parts[1])
                         
-            except ValueError:
-                logger.warning(f"Skipping folder with invalid name format: {folder.name}")
-                continue
+                        # Get all images in this folder
+                        with os.scandir(folder.path) as entries:
+                            images = [
+                                Path(entry.path) for entry in entries
+                                if entry.is_file()
+                                and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+                            ]
+                        
+                        if images:
+                            size_groups[(width_cm, height_cm)] = images
+                            logger.info("Found %d images for size %s×%scm",
+                                        len(images), width_cm, height_cm)
+                            
+                except ValueError:
+                    logger.warning("Skipping folder with invalid name format: %s", folder.name)
+                    continue
         
         return size_groups
 
-    def _create_single_collage(
-        self, 
-        image_paths: List[Path], 
-        collage_number: int,
-        image_width_cm: float, 
-        image_height_cm: float,
-        cols: int, 
-        rows: int, 
-        margin_cm: float
-    ) -> None:
-        """
-        Create a single collage page.
-        
-        Args:
-            image_paths: List of paths to images to include
-            collage_number: Sequence number for this collage
-            image_width_cm: Target image width in cm
-            image_height_cm: Target image height in cm
-            cols: Number of columns in grid
-            rows: Number of rows in grid
-            margin_cm: Margin between images in cm
-        """
-        # Get page dimensions in pixels
-        page_width_cm, page_height_cm = PAGE_SIZES[self.page_size]
-        page_width_px = cm_to_pixels(page_width_cm, self.dpi)
-        page_height_px = cm_to_pixels(page_height_cm, self.dpi)
-        
-        # Convert measurements to pixels
-        image_width_px = cm_to_pixels(image_width_cm, self.dpi)
-        image_height_px = cm_to_pixels(image_height_cm, self.dpi)
-        margin_px = cm_to_pixels(margin_cm, self.dpi)
-        
-        # Create white background
-        collage = Image.new('RGB', (page_width_px, page_height_px), 'white')
-        
-        # Calculate starting position for centering the grid
-        grid_width = cols * image_width_px + (cols - 1) * margin_px
-        grid_height = rows * image_height_px + (rows - 1) * margin_px
+@functools.lru_cache(maxsize=128)
+def _layout(
+    page_size: str,
+    dpi: int,
+    margin_mm: float,
+    image_width_cm: float,
+    image_height_cm: float
+) -> Tuple[int, int, int, int, int, int, int]:
+    """
+    Calculate the pixel dimensions and grid for one image size on a page.
+    
+    Args:
+        page_size: Page size key into PAGE_SIZES
+        dpi: Resolution for the collage
+        margin_mm: Margin between images in millimeters
+        image_width_cm: Target image width in cm
+        image_height_cm: Target image height in cm
         
-        start_x = (page_width_px - grid_width) // 2
-        start_y = (page_height_px - grid_height) // 2
+    Returns:
+        (page_width_px, page_height_px, image_width_px, image_height_px,
+        margin_px, cols, rows)
+    """
+    # Get page dimensions
+    page_width_cm, page_height_cm = PAGE_SIZES[page_size]
+    margin_cm = margin_mm / 10.0  # Convert mm to cm
+    
+    # Calculate how many images can fit per page
+    available_width = page_width_cm - 2 * margin_cm
+    available_height = page_height_cm - 2 * margin_cm
+    
+    # Calculate grid dimensions
+    cols = int((available_width + margin_cm) / (image_width_cm + margin_cm))
+    rows = int((available_height + margin_cm) / (image_height_cm + margin_cm))
+    
+    return (
+        cm_to_pixels(page_width_cm, dpi), cm_to_pixels(page_height_cm, dpi),
+        cm_to_pixels(image_width_cm, dpi), cm_to_pixels(image_height_cm, dpi),
+        cm_to_pixels(margin_cm, dpi), cols, rows
+    )
+
+def _init_worker(log_queue: multiprocessing.Queue, log_level: int) -> None:
+    """
+    Route a worker process' log records back to the parent process.
+    
+    Args:
+        log_queue: Queue drained by the parent's QueueListener
+        log_level: Root logger level of the parent process
+    """
+    root_logger = logging.getLogger()
+    root_logger.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root_logger.setLevel(log_level)
+
+def _render_collage(job: Tuple, slot_threads: int = 1) -> None:
+    """
+    Unpack a job tuple and render it (entry point for worker processes).
+    
+    Args:
+        job: Arguments for _create_single_collage, as a tuple
+        slot_threads: Number of threads loading images for the collage
+    """
+    _create_single_collage(*job, slot_threads=slot_threads)
+
+def _create_single_collage(
+    image_paths: List[Path], 
+    collage_path: Path,
+    dpi: int,
+    page_width_px: int,
+    page_height_px: int,
+    image_width_px: int, 
+    image_height_px: int,
+    cols: int, 
+    rows: int, 
+    margin_px: int,
+    output_format: str,
+    quality: int,
+    slot_threads: int = 1
+) -> None:
+    """
+    Create a single collage page.
+    
+    This is a module-level function taking only picklable arguments so it
+    can run in a worker process.
+    
+    Args:
+        image_paths: List of paths to images to include
+        collage_path: Output path for the collage
+        dpi: Resolution for the collage
+        page_width_px: Page width in pixels
+        page_height_px: Page height in pixels
+        image_width_px: Target image width in pixels
+        image_height_px: Target image height in pixels
+        cols: Number of columns in grid
+        rows: Number of rows in grid
+        margin_px: Margin between images in pixels
+        output_format: Pillow format name to save as ('JPEG', 'PNG')
+        quality: JPEG quality
+        slot_threads: Number of threads loading images ahead of pasting
+    """
+    # Create white background
+    collage = Image.new('RGB', (page_width_px, page_height_px), 'white')
+    
+    # Calculate starting position for centering the grid
+    grid_width = cols * image_width_px + (cols - 1) * margin_px
+    grid_height = rows * image_height_px + (rows - 1) * margin_px
+    
+    start_x = (page_width_px - grid_width) // 2
+    start_y = (page_height_px - grid_height) // 2
+    
+    # Decode and resize upcoming images on worker threads (Pillow releases
+    # the GIL while decoding and resizing) while this thread pastes them
+    image_paths = image_paths[:cols * rows]  # Safety check
+    with ThreadPoolExecutor(max_workers=slot_threads) as executor:
+        slots = executor.map(
+            _prepare_slot, image_paths,
+            repeat(image_width_px), repeat(image_height_px)
+        )
         
         # Place images
-        for idx, image_path in enumerate(image_paths):
-            if idx >= cols * rows:  # Safety check
-                break
-                
+        for idx, img in enumerate(slots):
+            if img is None:
+                continue
+            
             row = idx // cols
             col = idx % cols
             
@@ -212,28 +384,68 @@ class PhotoPacker:
             x = start_x + col * (image_width_px + margin_px)
             y = start_y + row * (image_height_px + margin_px)
             
-            try:
-                # Load image
-                img = Image.open(image_path)
-                
-                # Convert to RGB if necessary
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Resize to fit
-                img_resized = resize_image_to_fit(img, image_width_px, image_height_px)
-                
-                # Center on white background
-                img_centered = center_on_background(img_resized, image_width_px, image_height_px)
-                
-                # Paste onto collage
-                collage.paste(img_centered, (x, y))
-                
-            except Exception as e:
-                logger.error(f"Error processing image {image_path}: {e}")
-                continue
+            # Paste centered in the slot; the collage is already white, so
+            # there is no need for a separate slot-sized background.
+            # Transparent images are composited onto it via their alpha.
+            paste_x = x + (image_width_px - img.width) // 2
+            paste_y = y + (image_height_px - img.height) // 2
+            mask = img if img.mode in ALPHA_MODES else None
+            collage.paste(img, (paste_x, paste_y), mask)
+    
+    # Save collage
+    if output_format == 'JPEG':
+        # No chroma subsampling, to keep fine detail sharp in print
+        collage.save(collage_path, 'JPEG', dpi=(dpi, dpi),
+                     quality=quality, subsampling=0)
+    else:
+        collage.save(collage_path, output_format, dpi=(dpi, dpi))
+    logger.info("Created collage: %s", collage_path)
+
+def _prepare_slot(
+    image_path: Path, 
+    image_width_px: int, 
+    image_height_px: int
+) -> Optional[Image.Image]:
+    """
+    Load an image and resize it to fit a collage slot.
+    
+    Args:
+        image_path: Path to the image
+        image_width_px: Slot width in pixels
+        image_height_px: Slot height in pixels
+        
+    Returns:
+        Resized RGB, RGBA or LA image, or None if the image could not be processed
+    """
+    try:
+        # Load image
+        with Image.open(image_path) as img:
+            # libvips resizes straight from the file with shrink-on-load;
+            # Image.open has only read the header at this point
+            if can_load_with_vips(img):
+                width, height = fit_size(img.width, img.height,
+                                         image_width_px, image_height_px)
+                try:
+                    return load_with_vips(image_path, width, height)
+                except VipsLoadError as e:
+                    logger.debug("libvips could not load %s, using Pillow: %s",
+                                 image_path, e)
+            
+            # Let the JPEG decoder shrink by 1/2, 1/4 or 1/8 while decoding,
+            # never going below the slot size
+            if img.format == 'JPEG':
+                img.draft('RGB', (image_width_px, image_height_px))
+            
+            # Convert to RGB if necessary, keeping any transparency so the
+            # image can be composited straight onto the white page
+            if img.mode in ('P', 'RGB', 'L') and 'transparency' in img.info:
+                img = img.convert('RGBA')
+            elif img.mode != 'RGB' and img.mode not in ALPHA_MODES:
+                img = img.convert('RGB')
+            
+            # Resize to fit, dropping the full-resolution buffer right away
+            return resize_image_to_fit(img, image_width_px, image_height_px)
         
-        # Save collage
-        collage_path = self.output_dir / "collages" / f"collage_{collage_number:03d}.png"
-        collage.save(collage_path, 'PNG', dpi=(self.dpi, self.dpi))
-        logger.info(f"Created collage: {collage_path}")
\ No newline at end of file
+    except Exception as e:
+        logger.error("Error processing image %s: %s", image_path, e)
+        return None
\ No newline at end of file
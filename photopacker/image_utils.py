@@ -2,9 +2,31 @@
 Utility functions for image processing and manipulation.
 """
 
+import functools
+import logging
+from pathlib import Path
 from PIL import Image
 from typing import Tuple
 
+# libvips is an optional, much faster (SIMD, shrink-on-load) image loader
+try:
+    import pyvips
+except (ImportError, OSError):
+    pyvips = None
+else:
+    # libvips reports every operation at INFO level
+    logging.getLogger('pyvips').setLevel(logging.WARNING)
+
+class VipsLoadError(Exception):
+    """Raised when libvips can't load an image; Pillow may still manage."""
+
+# File formats libvips loads in every build (not BMP, for example)
+VIPS_FORMATS = {'JPEG', 'PNG', 'TIFF'}
+
+# Downscale ratio from which BILINEAR is indistinguishable from LANCZOS in print
+BILINEAR_MIN_SCALE = 4.0
+
+@functools.lru_cache(maxsize=64)
 def cm_to_pixels(cm: float, dpi: int) -> int:
     """
     Convert centimeters to pixels based on DPI.
@@ -35,21 +57,102 @@ def resize_image_to_fit(
     Returns:
         Resized image
     """
+    new_width, new_height = fit_size(img.width, img.height, target_width, target_height)
+    
+    # LANCZOS only pays off for mild scaling; large reductions use the much
+    # cheaper BILINEAR kernel
+    scale = max(img.width / new_width, img.height / new_height)
+    if scale >= BILINEAR_MIN_SCALE:
+        resample = Image.Resampling.BILINEAR
+    else:
+        resample = Image.Resampling.LANCZOS
+    return img.resize((new_width, new_height), resample)
+
+def fit_size(
+    width: int, 
+    height: int, 
+    target_width: int, 
+    target_height: int
+) -> Tuple[int, int]:
+    """
+    Calculate the size that fits within target dimensions while maintaining aspect ratio.
+    
+    Args:
+        width: Source width in pixels
+        height: Source height in pixels
+        target_width: Target width in pixels
+        target_height: Target height in pixels
+        
+    Returns:
+        Fitted (width, height) in pixels
+    """
     # Calculate scaling to fit exactly in the target size while maintaining aspect ratio
-    img_ratio = img.width / img.height
+    img_ratio = width / height
     target_ratio = target_width / target_height
     
     if img_ratio > target_ratio:
         # Image is wider, fit by width
-        new_width = target_width
-        new_height = int(target_width / img_ratio)
-    else:
-        # Image is taller, fit by height
-        new_height = target_height
-        new_width = int(target_height * img_ratio)
+        return target_width, int(target_width / img_ratio)
     
-    # Resize image
-    return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    # Image is taller, fit by height
+    return int(target_height * img_ratio), target_height
+
+def can_load_with_vips(img: Image.Image) -> bool:
+    """
+    Check whether an opened image file can be loaded with load_with_vips.
+    
+    Args:
+        img: The image, opened but not necessarily loaded
+        
+    Returns:
+        True if pyvips is installed and supports the file as 8-bit RGB
+    """
+    # A tRNS colour key makes libvips add an alpha band that Pillow's mode
+    # doesn't show; leave those to the Pillow path
+    return (pyvips is not None and img.mode == 'RGB'
+            and img.format in VIPS_FORMATS and 'transparency' not in img.info)
+
+def load_with_vips(image_path: Path, width: int, height: int) -> Image.Image:
+    """
+    Load an 8-bit RGB image file at the given size using libvips.
+    
+    libvips shrinks JPEGs while decoding and streams the rest, so the
+    full-resolution image is never held in memory.
+    
+    Args:
+        image_path: Path to the image
+        width: Output width in pixels (from fit_size)
+        height: Output height in pixels (from fit_size)
+        
+    Returns:
+        Resized RGB image
+        
+    Raises:
+        VipsLoadError: If libvips can't load the file as RGB
+    """
+    try:
+        # size='force' gives exactly width×height; fit_size already kept the
+        # aspect ratio. no_rotate matches Pillow, which ignores EXIF orientation.
+        vips_img = pyvips.Image.thumbnail(
+            str(image_path), width, height=height, size='force', no_rotate=True
+        )
+        
+        # Composite any alpha band onto white, like the collage background
+        if vips_img.hasalpha():
+            vips_img = vips_img.flatten(background=255)
+        
+        # 16-bit sources (e.g. some PNG/TIFF) come back as ushort
+        if vips_img.format != 'uchar' or vips_img.bands != 3:
+            vips_img = vips_img.colourspace('srgb')
+        
+        data = vips_img.write_to_memory()
+    except pyvips.Error as e:
+        raise VipsLoadError(str(e)) from e
+    
+    if vips_img.bands != 3 or vips_img.format != 'uchar':
+        raise VipsLoadError(f"Unexpected libvips image: {vips_img.bands} "
+                            f"{vips_img.format} bands")
+    return Image.frombytes('RGB', (vips_img.width, vips_img.height), data)
 
 def center_on_background(
     img: Image.Image, 
@@ -67,8 +170,12 @@ def center_on_background(
         bg_color: Background color as RGB tuple (default: white)
         
     Returns:
-        New image centered on background
+        Image centered on background (the input itself if it already fills it)
     """
+    # Nothing to center when the image already fills the background
+    if img.size == (bg_width, bg_height) and img.mode == 'RGB':
+        return img
+    
     # Create white background for this image slot
     bg_img = Image.new('RGB', (bg_width, bg_height), bg_color)
     
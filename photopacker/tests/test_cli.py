@@ -5,7 +5,9 @@ Tests for the CLI module.
 import unittest
 from unittest import mock
 import argparse
+import os
 import sys
+from pathlib import Path
 from photopacker.cli import parse_args, main
 
 class TestCLI(unittest.TestCase):
@@ -20,6 +22,9 @@ class TestCLI(unittest.TestCase):
         self.assertEqual(args.page_size, "a4")
         self.assertEqual(args.dpi, 300)
         self.assertEqual(args.margin, 2)
+        self.assertEqual(args.format, "jpg")
+        self.assertEqual(args.quality, 92)
+        self.assertIsNone(args.workers)
         self.assertFalse(args.verbose)
         
     def test_parse_args_custom_values(self):
@@ -30,6 +35,9 @@ class TestCLI(unittest.TestCase):
             "--page-size", "a3",
             "--dpi", "150",
             "--margin", "5",
+            "--format", "png",
+            "--quality", "80",
+            "--workers", "3",
             "--verbose"
         ])
         
@@ -38,9 +46,26 @@ class TestCLI(unittest.TestCase):
         self.assertEqual(args.page_size, "a3")
         self.assertEqual(args.dpi, 150)
         self.assertEqual(args.margin, 5)
+        self.assertEqual(args.format, "png")
+        self.assertEqual(args.quality, 80)
+        self.assertEqual(args.workers, 3)
         self.assertTrue(args.verbose)
         
-    @mock.patch("photopacker.cli.PhotoPacker")
+    def test_parse_args_rejects_non_integer_quality(self):
+        """Test that a non-integer --quality is a usage error."""
+        with mock.patch("sys.stderr"), self.assertRaises(SystemExit):
+            parse_args(["-i", "input", "-o", "output", "--quality", "high"])
+        
+    @mock.patch("photopacker.cli.logger")
+    @mock.patch("photopacker.cli.setup_logging")
+    def test_main_rejects_out_of_range_quality(self, mock_setup_logging, mock_logger):
+        """Test that main reports a JPEG quality outside 1-95 as a usage error."""
+        for quality in ("0", "150", "-5"):
+            result = main(["-i", "input", "-o", "output", "--quality", quality])
+            self.assertEqual(result, 2)
+        self.assertIn("Quality must be between", str(mock_logger.error.call_args[0][1]))
+        
+    @mock.patch("photopacker.core.PhotoPacker")
     def test_main_creates_photopacker_instance(self, mock_packer_class):
         """Test that main creates a PhotoPacker instance with the right args."""
         # Setup mock
@@ -56,12 +81,34 @@ class TestCLI(unittest.TestCase):
             output_dir="output",
             page_size="a3",
             dpi=300,
-            margin_mm=2
+            margin_mm=2,
+            output_format="jpg",
+            quality=92,
+            workers=os.cpu_count() or 1
         )
         
         # Assert process was called and return value is correct
         mock_packer_instance.process.assert_called_once()
         self.assertEqual(result, 0)
+        
+    def test_parse_args_does_not_import_pillow(self):
+        """Test that the CLI module can parse arguments without loading Pillow."""
+        import subprocess
+        import photopacker
+        code = (
+            "import sys; from photopacker.cli import parse_args; "
+            "parse_args(['-i', 'input', '-o', 'output']); "
+            "print('PIL' in sys.modules)"
+        )
+        # Run from the package's parent so photopacker is importable
+        # regardless of the test runner's working directory
+        package_parent = Path(photopacker.__file__).resolve().parent.parent
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=package_parent, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "False")
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -4,6 +4,8 @@ Tests for the core PhotoPacker functionality.
 
 import unittest
 from unittest import mock
+import io
+import logging
 import os
 import tempfile
 from pathlib import Path
@@ -11,6 +13,7 @@ from PIL import Image
 
 from photopacker.core import PhotoPacker
 from photopacker.constants import PAGE_SIZES
+from photopacker.image_utils import VipsLoadError
 
 class TestPhotoPacker(unittest.TestCase):
     """Test case for PhotoPacker functionality."""
@@ -50,6 +53,43 @@ class TestPhotoPacker(unittest.TestCase):
             )
         self.assertIn("Unsupported page size", str(context.exception))
         
+        # Invalid output format
+        with self.assertRaises(ValueError) as context:
+            PhotoPacker(
+                input_dir=str(self.input_dir),
+                output_dir=str(self.output_dir),
+                output_format="gif"
+            )
+        self.assertIn("Unsupported output format", str(context.exception))
+        
+        # Out-of-range JPEG quality
+        for quality in (0, 150):
+            with self.assertRaises(ValueError) as context:
+                PhotoPacker(
+                    input_dir=str(self.input_dir),
+                    output_dir=str(self.output_dir),
+                    quality=quality
+                )
+            self.assertIn("Quality must be between", str(context.exception))
+        
+        # Quality is ignored for PNG output
+        packer = PhotoPacker(
+            input_dir=str(self.input_dir),
+            output_dir=str(self.output_dir),
+            output_format="png",
+            quality=150
+        )
+        self.assertEqual(packer.output_format, "png")
+        
+        # No workers
+        with self.assertRaises(ValueError) as context:
+            PhotoPacker(
+                input_dir=str(self.input_dir),
+                output_dir=str(self.output_dir),
+                workers=0
+            )
+        self.assertIn("Workers must be at least 1", str(context.exception))
+        
     def test_output_dir_creation(self):
         """Test that output directories are created."""
         # Remove output directory to test creation
@@ -105,6 +145,224 @@ class TestPhotoPacker(unittest.TestCase):
         
         # Check that non-image files were filtered out
         self.assertFalse(any(p.name == "not_an_image.txt" for p in size_groups[(10.0, 15.0)]))
+        
+    @mock.patch("photopacker.core.logger")
+    def test_process_creates_collages(self, mock_logger):
+        """Test that processing renders one collage per page of images."""
+        # 10x10cm at low DPI fits a 2x2 grid on A4, so 5 images need 2 pages
+        folder_10_10 = self.input_dir / "10_10"
+        os.makedirs(folder_10_10)
+        for i in range(5):
+            Image.new('RGB', (60, 40), color='red').save(folder_10_10 / f"image{i}.jpg")
+        
+        packer = PhotoPacker(
+            input_dir=str(self.input_dir),
+            output_dir=str(self.output_dir),
+            dpi=30,
+            output_format="png"
+        )
+        
+        self.assertEqual(packer.process(), 0)
+        
+        collages = sorted(p.name for p in (self.output_dir / "collages").iterdir())
+        self.assertEqual(collages, ["collage_001.png", "collage_002.png"])
+        
+    @mock.patch("photopacker.core.logger")
+    def test_process_saves_jpeg_by_default(self, mock_logger):
+        """Test that collages are saved as JPEG with the page DPI by default."""
+        folder_10_10 = self.input_dir / "10_10"
+        os.makedirs(folder_10_10)
+        Image.new('RGB', (60, 40), color='red').save(folder_10_10 / "image.png")
+        
+        packer = PhotoPacker(
+            input_dir=str(self.input_dir),
+            output_dir=str(self.output_dir),
+            dpi=30
+        )
+        
+        self.assertEqual(packer.process(), 0)
+        
+        with Image.open(self.output_dir / "collages" / "collage_001.jpg") as collage:
+            self.assertEqual(collage.format, "JPEG")
+            self.assertEqual(collage.info["dpi"], (30, 30))
+
+    @mock.patch("photopacker.core.logger")
+    def test_process_places_images_in_grid_order(self, mock_logger):
+        """Test that slots are pasted in image order even though they are
+        loaded on a thread pool."""
+        folder_10_10 = self.input_dir / "10_10"
+        os.makedirs(folder_10_10)
+        colors = {
+            "image0.png": (255, 0, 0),
+            "image1.png": (0, 255, 0),
+            "image2.png": (0, 0, 255),
+            "image3.png": (255, 255, 0),
+        }
+        for name, color in colors.items():
+            Image.new('RGB', (60, 60), color=color).save(folder_10_10 / name)
+        
+        packer = PhotoPacker(
+            input_dir=str(self.input_dir),
+            output_dir=str(self.output_dir),
+            dpi=30,
+            output_format="png"
+        )
+        
+        # scandir order is arbitrary, so read back the order the packer uses
+        image_paths = packer._group_images_by_size()[(10.0, 10.0)]
+        
+        self.assertEqual(packer.process(), 0)
+        
+        # At 30 DPI the 2×2 grid of 118px slots starts at (5, 56), 2px apart
+        with Image.open(self.output_dir / "collages" / "collage_001.png") as collage:
+            for idx, image_path in enumerate(image_paths):
+                row, col = divmod(idx, 2)
+                center = (5 + col * 120 + 59, 56 + row * 120 + 59)
+                self.assertEqual(collage.getpixel(center), colors[image_path.name])
+        
+    @mock.patch("photopacker.core.logger")
+    def test_process_after_resizing_in_parent(self, mock_logger):
+        """Test that workers still render after the parent process has loaded
+        an image (libvips threads must not be inherited by forked workers)."""
+        from photopacker.core import _prepare_slot
+        
+        folder_10_10 = self.input_dir / "10_10"
+        os.makedirs(folder_10_10)
+        Image.new('RGB', (400, 200), color='red').save(self.input_dir / "parent.png")
+        self.assertIsNotNone(_prepare_slot(self.input_dir / "parent.png", 100, 100))
+        
+        for i in range(5):
+            Image.new('RGB', (60, 40), color='red').save(folder_10_10 / f"image{i}.jpg")
+        
+        packer = PhotoPacker(
+            input_dir=str(self.input_dir),
+            output_dir=str(self.output_dir),
+            dpi=30,
+            workers=2
+        )
+        
+        self.assertEqual(packer.process(), 0)
+        self.assertEqual(len(list((self.output_dir / "collages").iterdir())), 2)
+        
+    def test_worker_errors_reach_stderr_without_logging_config(self):
+        """Test that worker errors still print when the caller has no handlers."""
+        folder_10_10 = self.input_dir / "10_10"
+        os.makedirs(folder_10_10)
+        for i in range(4):
+            Image.new('RGB', (60, 40), color='red').save(folder_10_10 / f"image{i}.jpg")
+        (folder_10_10 / "broken.jpg").write_bytes(b"not an image")
+        
+        packer = PhotoPacker(
+            input_dir=str(self.input_dir),
+            output_dir=str(self.output_dir),
+            dpi=30,
+            workers=2
+        )
+        
+        with mock.patch.object(logging.getLogger(), "handlers", []), \
+                mock.patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            self.assertEqual(packer.process(), 0)
+        
+        self.assertIn("Error processing image", stderr.getvalue())
+        self.assertIn("broken.jpg", stderr.getvalue())
+        
+    def test_layout(self):
+        """Test page, slot and grid dimensions for the default settings."""
+        from photopacker.core import _layout
+        
+        # 10×15cm on A4 at 300 DPI with 2mm margins: a 2×1 grid
+        self.assertEqual(
+            _layout("a4", 300, 2, 10.0, 15.0),
+            (2480, 3507, 1181, 1771, 23, 2, 1)
+        )
+        
+        # Too large for the page
+        self.assertEqual(_layout("a4", 300, 2, 30.0, 40.0)[5:], (0, 0))
+        
+    def test_large_images_are_allowed(self):
+        """Test that Pillow's decompression bomb limit is disabled."""
+        self.assertIsNone(Image.MAX_IMAGE_PIXELS)
+        
+    @mock.patch("photopacker.core.logger")
+    def test_prepare_slot_skips_unreadable_image(self, mock_logger):
+        """Test that an unreadable image yields no slot instead of failing."""
+        from photopacker.core import _prepare_slot
+        
+        broken = self.input_dir / "broken.jpg"
+        broken.write_bytes(b"not an image")
+        self.assertIsNone(_prepare_slot(broken, 100, 100))
+        mock_logger.error.assert_called_once()
+        
+        valid = self.input_dir / "valid.png"
+        Image.new('RGBA', (400, 200), color='red').save(valid)
+        slot = _prepare_slot(valid, 100, 100)
+        self.assertEqual(slot.mode, 'RGBA')
+        self.assertEqual(slot.size, (100, 50))
+        
+    @mock.patch("photopacker.core.logger")
+    def test_prepare_slot_opens_all_supported_formats(self, mock_logger):
+        """Test that every supported extension still opens with only the
+        explicitly registered Pillow plugins."""
+        from photopacker.core import _prepare_slot
+        
+        for extension in (".jpg", ".png", ".tif", ".bmp"):
+            path = self.input_dir / f"image{extension}"
+            Image.new('RGB', (400, 200), color='red').save(path)
+            slot = _prepare_slot(path, 100, 100)
+            self.assertIsNotNone(slot, extension)
+            self.assertEqual(slot.size, (100, 50))
+        mock_logger.error.assert_not_called()
+        
+    @mock.patch("photopacker.core.logger")
+    @mock.patch("photopacker.core.can_load_with_vips", return_value=True)
+    @mock.patch("photopacker.core.load_with_vips", side_effect=VipsLoadError("unsupported"))
+    def test_prepare_slot_falls_back_to_pillow(self, mock_load, mock_can_load, mock_logger):
+        """Test that a file libvips can't load is still loaded by Pillow."""
+        from photopacker.core import _prepare_slot
+        
+        path = self.input_dir / "image.tif"
+        Image.new('RGB', (400, 200), color='red').save(path)
+        slot = _prepare_slot(path, 100, 100)
+        
+        mock_load.assert_called_once()
+        self.assertEqual(slot.size, (100, 50))
+        self.assertEqual(slot.getpixel((50, 25)), (255, 0, 0))  # Red
+        mock_logger.error.assert_not_called()
+        
+    @mock.patch("photopacker.core.logger")
+    def test_prepare_slot_keeps_colour_key_transparency(self, mock_logger):
+        """Test that an RGB PNG colour key becomes transparent, not printed."""
+        from photopacker.core import _prepare_slot
+        
+        img = Image.new('RGB', (400, 200), color='red')
+        img.paste((0, 255, 0), (200, 0, 400, 200))
+        path = self.input_dir / "keyed.png"
+        img.save(path, transparency=(0, 255, 0))
+        
+        slot = _prepare_slot(path, 400, 200)
+        self.assertEqual(slot.mode, 'RGBA')
+        self.assertEqual(slot.getpixel((100, 100)), (255, 0, 0, 255))  # Opaque red
+        self.assertEqual(slot.getpixel((300, 100))[3], 0)  # Transparent
+        
+    @mock.patch("photopacker.core.logger")
+    def test_process_composites_transparency_on_white(self, mock_logger):
+        """Test that transparent pixels come out white rather than their color."""
+        folder_10_10 = self.input_dir / "10_10"
+        os.makedirs(folder_10_10)
+        Image.new('RGBA', (60, 40), color=(255, 0, 0, 0)).save(folder_10_10 / "image.png")
+        
+        packer = PhotoPacker(
+            input_dir=str(self.input_dir),
+            output_dir=str(self.output_dir),
+            dpi=30,
+            output_format="png"
+        )
+        
+        self.assertEqual(packer.process(), 0)
+        
+        # At 30 DPI the first 10×10cm slot spans x 5-123, y 56-174
+        with Image.open(self.output_dir / "collages" / "collage_001.png") as collage:
+            self.assertEqual(collage.getpixel((64, 115)), (255, 255, 255))
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
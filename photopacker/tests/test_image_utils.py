@@ -3,10 +3,16 @@ Tests for image utility functions.
 """
 
 import unittest
+from unittest import mock
+import tempfile
+from pathlib import Path
 from PIL import Image
 import io
 
-from photopacker.image_utils import cm_to_pixels, resize_image_to_fit, center_on_background
+from photopacker import image_utils
+from photopacker.image_utils import (
+    cm_to_pixels, fit_size, resize_image_to_fit, center_on_background
+)
 
 class TestImageUtils(unittest.TestCase):
     """Test case for image utility functions."""
@@ -41,6 +47,48 @@ class TestImageUtils(unittest.TestCase):
         self.assertEqual(resized.height, 100)  # Height should be scaled down to 100
         self.assertEqual(resized.width, 200)   # Width should be scaled down to 200
         
+    def test_resize_image_to_fit_filter_choice(self):
+        """Test that large downscales use BILINEAR and mild ones LANCZOS."""
+        img = mock.Mock(width=2000, height=1000, mode='RGB')
+        resize_image_to_fit(img, 300, 300)
+        img.resize.assert_called_once_with((300, 150), Image.Resampling.BILINEAR)
+        
+        img = mock.Mock(width=400, height=200, mode='RGB')
+        resize_image_to_fit(img, 300, 300)
+        img.resize.assert_called_once_with((300, 150), Image.Resampling.LANCZOS)
+        
+    @unittest.skipIf(image_utils.pyvips is None, "pyvips is not installed")
+    def test_load_with_vips(self):
+        """Test that the libvips loader produces the exact requested size."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "image.png"
+            Image.new('RGB', (400, 200), color='red').save(path)
+            
+            width, height = fit_size(400, 200, 300, 300)
+            loaded = image_utils.load_with_vips(path, width, height)
+        
+        self.assertEqual(loaded.size, (300, 150))
+        self.assertEqual(loaded.mode, 'RGB')
+        self.assertEqual(loaded.getpixel((150, 75)), (255, 0, 0))  # Red
+        
+    @unittest.skipIf(image_utils.pyvips is None, "pyvips is not installed")
+    def test_load_with_vips_colour_key(self):
+        """Test that a PNG tRNS colour key is flattened onto white, not misread."""
+        img = Image.new('RGB', (400, 200), color='red')
+        img.paste((0, 255, 0), (200, 0, 400, 200))
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "image.png"
+            img.save(path, transparency=(0, 255, 0))
+            
+            with Image.open(path) as opened:
+                self.assertFalse(image_utils.can_load_with_vips(opened))
+            loaded = image_utils.load_with_vips(path, 400, 200)
+        
+        self.assertEqual(loaded.mode, 'RGB')
+        self.assertEqual(loaded.getpixel((100, 100)), (255, 0, 0))  # Red
+        self.assertEqual(loaded.getpixel((300, 100)), (255, 255, 255))  # White
+        
     def test_center_on_background(self):
         """Test centering an image on a background."""
         # Create a test image
@@ -63,6 +111,11 @@ class TestImageUtils(unittest.TestCase):
         # Check corners - should be white
         self.assertEqual(centered.getpixel((0, 0)), (255, 255, 255))  # White
         self.assertEqual(centered.getpixel((bg_width-1, bg_height-1)), (255, 255, 255))  # White
+        
+    def test_center_on_background_exact_fit(self):
+        """Test that an image filling the background is returned as-is."""
+        img = Image.new('RGB', (300, 200), color='red')
+        self.assertIs(center_on_background(img, 300, 200), img)
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -25,6 +25,9 @@ setup(
     url="https://github.com/yotam4h/PhotoPacker",
     packages=find_packages(),
     install_requires=["Pillow>=9.0.0"],
+    extras_require={
+        "fast": ["pyvips>=2.1"],
+    },
     python_requires=">=3.7",
     entry_points={
         "console_scripts": [